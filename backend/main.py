@@ -1,15 +1,22 @@
 import os
+import json
+import asyncio
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Optional
+from cachetools import LRUCache, TTLCache
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from sse_starlette.sse import EventSourceResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain.agents import create_tool_calling_agent, AgentExecutor
-from langchain.memory import ConversationBufferWindowMemory
-from tools import create_calendar_event, get_calendar_events, update_calendar_event, find_available_time_slots, get_event_details
+from langchain.memory import ConversationSummaryBufferMemory
+from tools import CALENDAR_TOOLS, READ_ONLY_TOOL_NAMES, LOCAL_TZ, LOCAL_TZ_NAME
 import datetime
-from tzlocal import get_localzone_name
 
 # Load environment variables
 load_dotenv()
@@ -18,10 +25,24 @@ load_dotenv()
 if os.getenv("GOOGLE_API_KEY") is None:
     raise Exception("GOOGLE_API_KEY not found. Please set it in .env file.")
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Under ainvoke LangChain runs the sync Calendar tools in the loop's default
+    # executor, which only has min(32, cpu + 4) threads. Tool calls are I/O bound,
+    # so size the pool for concurrent chats rather than for CPU count.
+    executor = ThreadPoolExecutor(
+        max_workers=int(os.getenv("TOOL_THREADS", "32")),
+        thread_name_prefix="calendar-tool",
+    )
+    asyncio.get_running_loop().set_default_executor(executor)
+    yield
+    executor.shutdown(wait=False)
+
 # Initialize FastAPI app
 app = FastAPI(title="Calendar Assistant API",
              description="A powerful calendar assistant that can create, find, and update Google Calendar events.",
-             version="1.0.0")
+             version="1.0.0",
+             lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -35,26 +56,74 @@ app.add_middleware(
 llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash")
 
 # Define the tools
-tools = [create_calendar_event, get_calendar_events, update_calendar_event, find_available_time_slots, get_event_details]
+tools = CALENDAR_TOOLS
 
-# Global conversation memory
-memory = ConversationBufferWindowMemory(
-    memory_key="chat_history",
-    return_messages=True,
-    k=10 
-)
+# Short-lived cache of answers to read-only queries. The key includes the session history,
+# which grows every turn, so in practice it only hits for the same first question in fresh
+# sessions. Like the event list cache it is per worker process, and a write only clears it
+# in the worker that made it, so it is off (0) unless explicitly set; enable it only for a
+# single-worker deployment.
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "0"))
+response_cache = TTLCache(maxsize=512, ttl=max(RESPONSE_CACHE_TTL, 1))
+
+# Approximate token budget for the verbatim part of each session's history
+MEMORY_TOKEN_LIMIT = int(os.getenv("MEMORY_TOKEN_LIMIT", "1500"))
+
+class SessionMemory(ConversationSummaryBufferMemory):
+    """
+    Keeps the most recent turns verbatim and folds older ones into a running summary.
+
+    The history size is estimated locally (about four characters per token) because
+    the Gemini chat model counts tokens with one API call per message.
+    """
+
+    @staticmethod
+    def _approx_tokens(message):
+        return len(str(message.content)) // 4 + 1
+
+    def _pop_overflow(self):
+        """Removes the oldest messages until the buffer fits the token limit and returns them."""
+        buffer = self.chat_memory.messages
+        pruned = []
+        size = sum(self._approx_tokens(m) for m in buffer)
+        while buffer and size > self.max_token_limit:
+            message = buffer.pop(0)
+            size -= self._approx_tokens(message)
+            pruned.append(message)
+        return pruned
 
-# Create prompt with current time
-def create_prompt_with_time():
-    local_timezone = get_localzone_name()
-    current_time_str = f"{datetime.datetime.now().isoformat()} (Timezone: {local_timezone})"
-    
-    return ChatPromptTemplate.from_messages(
-        [
-            (
-                "system",
-                f"""You are a powerful calendar assistant. You can create, find, and update Google Calendar events.
-The current date and time is {current_time_str}. Use this for any relative time queries.
+    def prune(self) -> None:
+        pruned = self._pop_overflow()
+        if pruned:
+            self.moving_summary_buffer = self.predict_new_summary(pruned, self.moving_summary_buffer)
+
+    async def aprune(self) -> None:
+        pruned = self._pop_overflow()
+        if pruned:
+            self.moving_summary_buffer = await self.apredict_new_summary(pruned, self.moving_summary_buffer)
+
+# Conversation memory per client session, bounded so idle sessions are evicted
+sessions = LRUCache(maxsize=10_000)
+
+def get_memory(session_id):
+    """Returns the conversation memory for a session, creating it on first use."""
+    memory = sessions.get(session_id)
+    if memory is None:
+        memory = SessionMemory(
+            llm=llm,
+            max_token_limit=MEMORY_TOKEN_LIMIT,
+            memory_key="chat_history",
+            input_key="input",
+            output_key="output",
+            return_messages=True,
+        )
+        sessions[session_id] = memory
+    return memory
+
+# Static agent instructions. Keep per-request values out of this block so the
+# prompt prefix stays byte-identical across turns and can be cached by the provider.
+SYSTEM_PROMPT = """You are a powerful calendar assistant. You can create, find, and update Google Calendar events.
+The latest user message starts with the current date and time in a <runtime> tag. Use this for any relative time queries.
 
 **IMPORTANT: Conversation Memory**
 - You maintain conversation history and can refer to previous interactions.
@@ -79,6 +148,7 @@ The current date and time is {current_time_str}. Use this for any relative time
 - The LLM must convert terms like "today" or "tomorrow" into a specific 'YYYY-MM-DD' date.
 - By default, assume a 30-minute duration unless the user specifies otherwise.
 - Example: "Find some time for a meeting tomorrow afternoon" -> Use `find_available_time_slots` with `start_date` set to tomorrow's date.
+- To find time that also suits other people, pass their emails as `calendar_ids`; the user's own calendar is always included.
 
 **Event Creation and Information:**
 - When you create an event, always save and remember the event details including the link.
@@ -93,6 +163,10 @@ The current date and time is {current_time_str}. Use this for any relative time
 5.  If you find multiple events, ask the user to clarify which one to edit.
 6.  Once you have the correct `event_id` from the tool's output, use `update_calendar_event` to apply the changes. The `event_id` is a short alphanumeric string. You **must** use the exact ID provided in the search results and not invent one.
 
+**Creating or Updating Several Events at Once:**
+- If one request creates several events, or changes the title, description or times of more than one event, use `batch_calendar_ops` with one entry per event instead of calling `create_calendar_event` or `update_calendar_event` repeatedly. Creates and updates can be combined in one call.
+- When moving an event with this tool, always provide both `start_time` and `end_time`.
+
 **Smart Update Example:**
 - User: "Move my 'Project Sync' meeting to 2 PM today."
 - Agent Action: First, use `get_calendar_events` with `query='Project Sync'` to find the event. Then, call `update_calendar_event` with **only** the `start_time` set to 2 PM. The tool will handle the rest.
@@ -101,27 +175,72 @@ The current date and time is {current_time_str}. Use this for any relative time
 - If you just created a "team meeting" and user asks "what's the link?", provide the link from the creation response.
 - If user says "add someone to that meeting", refer to the most recently discussed event.
 """
-            ),
-            ("placeholder", "{chat_history}"),
-            ("human", "{input}"),
-            ("placeholder", "{agent_scratchpad}"),
-        ]
-    )
 
-# Create the prompt and agent
-prompt = create_prompt_with_time()
-agent = create_tool_calling_agent(llm, tools, prompt)
-agent_executor = AgentExecutor(
-    agent=agent,
-    tools=tools,
-    memory=memory,
-    verbose=True,
-    handle_parsing_errors=True
+prompt = ChatPromptTemplate.from_messages(
+    [
+        ("system", SYSTEM_PROMPT),
+        ("placeholder", "{chat_history}"),
+        ("human", "<runtime>current_time={current_time}</runtime>\n{input}"),
+        ("placeholder", "{agent_scratchpad}"),
+    ]
 )
 
-# Define the request body for the chat endpoint
+def current_time():
+    """Returns the current local time as passed to the prompt."""
+    return f"{datetime.datetime.now(LOCAL_TZ).isoformat()} (Timezone: {LOCAL_TZ_NAME})"
+
+# Printing every agent step to stdout serializes concurrent requests; opt in for debugging
+AGENT_VERBOSE = os.getenv("AGENT_VERBOSE") == "1"
+
+# Create the agent once; only the memory differs between sessions
+agent = create_tool_calling_agent(llm, tools, prompt)
+
+def get_agent_executor(memory=None):
+    """
+    Builds an executor for one request. Without a memory the caller passes chat_history
+    itself and saves the turn with asave_context, keeping summarization off the event loop.
+    """
+    return AgentExecutor(
+        agent=agent,
+        tools=tools,
+        memory=memory,
+        verbose=AGENT_VERBOSE,
+        handle_parsing_errors=True,
+        return_intermediate_steps=True
+    )
+
+def response_cache_key(query, memory):
+    """
+    Hashes the query together with the conversation history the agent would see.
+    Returns None when the response cache is disabled, skipping the history walk.
+    """
+    if RESPONSE_CACHE_TTL <= 0:
+        return None
+    digest = hashlib.blake2b(query.encode(), digest_size=16)
+    for message in memory.load_memory_variables({})["chat_history"]:
+        digest.update(f"\x00{message.type}:{message.content}".encode())
+    return digest.digest()
+
+def is_read_only(intermediate_steps):
+    """Returns whether the agent only used tools that never modify the calendar."""
+    return {action.tool for action, _ in intermediate_steps} <= READ_ONLY_TOOL_NAMES
+
+def cache_response(key, output, intermediate_steps):
+    """Caches an answer if the agent only read from the calendar to produce it."""
+    if is_read_only(intermediate_steps):
+        if key is not None:
+            response_cache[key] = output
+    else:
+        # The calendar changed, so cached answers may be stale
+        response_cache.clear()
+
+# Define the request bodies
 class ChatRequest(BaseModel):
     query: str
+    session_id: str = "default"
+
+class ClearHistoryRequest(BaseModel):
+    session_id: str = "default"
 
 @app.post("/chat")
 async def chat(request: ChatRequest):
@@ -129,15 +248,64 @@ async def chat(request: ChatRequest):
     Receives a user query, processes it through the LangChain agent with conversation history,
     and returns the agent's response.
     """
-    response = agent_executor.invoke({"input": request.query})
-    return {"response": response["output"]}
+    memory = get_memory(request.session_id)
+    key = response_cache_key(request.query, memory)
+    cached = response_cache.get(key) if key is not None else None
+    if cached is not None:
+        await memory.asave_context({"input": request.query}, {"output": cached})
+        return {"response": cached, "read_only": True}
+
+    response = await get_agent_executor(memory).ainvoke({"input": request.query, "current_time": current_time()})
+    cache_response(key, response["output"], response["intermediate_steps"])
+    return {"response": response["output"], "read_only": is_read_only(response["intermediate_steps"])}
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Same as /chat, but streams the agent's reply as Server-Sent Events.
+    Each message carries a chunk of text; a final "done" event ends the reply and carries
+    {"read_only": bool}, true when the reply did not modify the calendar.
+    """
+    memory = get_memory(request.session_id)
+    key = response_cache_key(request.query, memory)
+
+    async def stream():
+        cached = response_cache.get(key) if key is not None else None
+        if cached is not None:
+            await memory.asave_context({"input": request.query}, {"output": cached})
+            yield {"data": cached}
+            yield {"event": "done", "data": json.dumps({"read_only": True})}
+            return
+
+        # The streaming path saves memory through the sync save_context, whose summary
+        # call would block the event loop; the history is passed in and saved here instead
+        executor = get_agent_executor()
+        chat_history = memory.load_memory_variables({})["chat_history"]
+        read_only = False
+        async for event in executor.astream_events(
+            {"input": request.query, "current_time": current_time(), "chat_history": chat_history}, version="v2"
+        ):
+            if event["event"] == "on_chat_model_stream":
+                content = event["data"]["chunk"].content
+                if isinstance(content, str) and content:
+                    yield {"data": content}
+            elif event["event"] == "on_chain_end" and not event.get("parent_ids"):
+                # End of the top-level agent run
+                response = event["data"]["output"]
+                await memory.asave_context({"input": request.query}, {"output": response["output"]})
+                cache_response(key, response["output"], response["intermediate_steps"])
+                read_only = is_read_only(response["intermediate_steps"])
+        yield {"event": "done", "data": json.dumps({"read_only": read_only})}
+
+    return EventSourceResponse(stream())
 
 @app.post("/clear-history")
-async def clear_history():
+async def clear_history(request: Optional[ClearHistoryRequest] = None):
     """
-    Clears the conversation memory.
+    Clears the conversation memory of a session and the cached responses.
     """
-    memory.clear()
+    sessions.pop(request.session_id if request else "default", None)
+    response_cache.clear()
     return {"status": "history cleared"}
 
 @app.get("/")
@@ -1,14 +1,22 @@
 import os
+import copy
 import json
 from langchain_core.tools import tool
 from pydantic import BaseModel, Field
 from typing import List, Optional
 import datetime
+import threading
+from bisect import bisect_left, bisect_right
+import httplib2
+from cachetools import LRUCache, TTLCache
+import google_auth_httplib2
+from google.auth.exceptions import RefreshError
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from googleapiclient.http import DEFAULT_HTTP_TIMEOUT_SEC, HttpRequest
 from tzlocal import get_localzone_name
 from dateutil.parser import parse as date_parse
 from dateutil.tz import gettz
@@ -16,8 +24,30 @@ from dateutil.tz import gettz
 # Use the more specific .events scope. This may require re-authentication.
 SCOPES = ["https://www.googleapis.com/auth/calendar.events", "https://www.googleapis.com/auth/calendar.readonly"]
 
-def get_calendar_service():
-    """Handles Google Calendar API authentication and returns a service object."""
+_UTC = datetime.timezone.utc
+
+# The process timezone does not change at runtime, so resolve it once
+LOCAL_TZ_NAME = get_localzone_name()
+LOCAL_TZ = gettz(LOCAL_TZ_NAME)
+
+# Refresh the access token this long before it expires so in-flight calls never hit expiry.
+TOKEN_REFRESH_MARGIN = datetime.timedelta(minutes=5)
+
+# Socket timeout in seconds for Calendar API calls. This is the library's own default:
+# writes are not retried, and a 50-request batch that notifies attendees can take a while.
+HTTP_TIMEOUT = DEFAULT_HTTP_TIMEOUT_SEC
+
+# Read-only calls are retried with exponential backoff on connection errors, 429 and 5xx.
+# Writes are not, since a retried insert could create a duplicate event.
+READ_RETRIES = 3
+
+# The service is built once per process; building it parses the discovery document.
+_service = None
+_creds = None
+_service_lock = threading.Lock()
+
+def _load_credentials():
+    """Handles Google Calendar API authentication and returns valid credentials."""
     creds = None
     
     # Try to get credentials from environment variables first (for deployment)
@@ -68,34 +98,216 @@ def get_calendar_service():
                 else:
                     raise FileNotFoundError("Error: No credentials available. Please set environment variables or provide credentials.json file.")
                 
-            # Save token for local development only
-            if os.path.exists("credentials.json"):
-                with open("token.json", "w") as token:
-                    token.write(creds.to_json())
+            _save_token(creds)
     
-    return build("calendar", "v3", credentials=creds)
+    return creds
+
+def _save_token(creds):
+    """Persists refreshed or newly issued credentials to token.json, for local development only."""
+    if os.path.exists("credentials.json"):
+        with open("token.json", "w") as token:
+            token.write(creds.to_json())
+
+# httplib2.Http is not thread-safe, so each worker thread keeps its own
+# persistent connection and reuses it across tool calls instead of reconnecting.
+_thread_local = threading.local()
+
+def _thread_http():
+    http = getattr(_thread_local, "http", None)
+    if http is None:
+        http = _thread_local.http = httplib2.Http(timeout=HTTP_TIMEOUT)
+    return http
+
+def _build_request(http, *args, **kwargs):
+    """Sends every API request over the calling thread's keep-alive connection."""
+    # The service's own AuthorizedHttp carries its credentials; the module-level
+    # _creds may already have been dropped by another thread.
+    return HttpRequest(google_auth_httplib2.AuthorizedHttp(http.credentials, http=_thread_http()), *args, **kwargs)
+
+def _needs_refresh(creds):
+    if not creds.valid:
+        return True
+    if creds.expiry is None:
+        return False
+    # google-auth stores expiry as a naive UTC datetime
+    now = datetime.datetime.now(_UTC).replace(tzinfo=None)
+    return creds.expiry - now < TOKEN_REFRESH_MARGIN
+
+def get_calendar_service():
+    """Returns the shared Google Calendar service object, authenticating on first use."""
+    global _service, _creds
+    # Read both once: another thread may reset them to None at any moment
+    service, creds = _service, _creds
+    if service is not None and creds is not None and not _needs_refresh(creds):
+        return service
+
+    with _service_lock:
+        if _service is None:
+            _creds = _load_credentials()
+            _service = build(
+                "calendar", "v3",
+                credentials=_creds,
+                requestBuilder=_build_request,
+                cache_discovery=False,
+                static_discovery=True,
+            )
+        elif _needs_refresh(_creds) and _creds.refresh_token:
+            try:
+                _creds.refresh(Request())
+            except RefreshError as error:
+                # The refresh token was revoked or expired; authenticate from scratch next time
+                _service = _creds = None
+                raise ValueError(f"Error: Google authorization could not be refreshed ({error}). Please re-authenticate.")
+            # Only a real refresh touches the disk, so a restart starts from the fresh token
+            _save_token(_creds)
+        return _service
+
+def invalidate_service():
+    """Drops the cached service and credentials so the next call authenticates again."""
+    global _service, _creds
+    with _service_lock:
+        _service = _creds = None
+
+# Recent events.list results keyed by their query parameters. A write clears it only in
+# the worker process that made it, so with several workers (as deployed) other workers can
+# miss a new or changed event for up to the TTL. It is off (0) unless explicitly set;
+# enable it only for a single-worker deployment.
+EVENT_LIST_CACHE_TTL = int(os.getenv("EVENT_LIST_CACHE_TTL", "0"))
+_list_cache = TTLCache(maxsize=256, ttl=max(EVENT_LIST_CACHE_TTL, 1))
+_list_cache_lock = threading.Lock()
+_list_cache_generation = 0
+
+# The API returns at most this many events per page
+MAX_PAGE_SIZE = 2500
+
+def _iter_events(service, list_kwargs, max_results):
+    """
+    Yields up to max_results events matching list_kwargs, following nextPageToken.
+    Events are yielded as each page arrives; a recent identical search is served from the cache.
+    """
+    key = tuple(sorted(list_kwargs.items())) + (("max_results", max_results),)
+    with _list_cache_lock:
+        items = _list_cache.get(key)
+        generation = _list_cache_generation
+    if items is not None:
+        yield from items
+        return
+
+    items = []
+    page_token = None
+    while len(items) < max_results:
+        page = service.events().list(
+            **list_kwargs,
+            maxResults=min(max_results - len(items), MAX_PAGE_SIZE),
+            pageToken=page_token,
+        ).execute(num_retries=READ_RETRIES)
+        page_items = page.get("items", [])[:max_results - len(items)]
+        items.extend(page_items)
+        yield from page_items
+        page_token = page.get("nextPageToken")
+        if not page_token:
+            break
+
+    if EVENT_LIST_CACHE_TTL <= 0:
+        return
+    with _list_cache_lock:
+        # Don't store a result that a write may have made stale while it was in flight
+        if generation == _list_cache_generation:
+            _list_cache[key] = items
+
+def _invalidate_event_cache():
+    global _list_cache_generation
+    with _list_cache_lock:
+        _list_cache_generation += 1
+        _list_cache.clear()
+
+# Last seen copy of recently read events, keyed by event ID and stored with its ETag.
+# Entries are always revalidated with If-None-Match, so they can never serve stale data.
+_event_cache = LRUCache(maxsize=512)
+_event_cache_lock = threading.Lock()
+
+def _get_event(service, event_id):
+    """Fetches an event, reusing the local copy when the server reports it unchanged (304)."""
+    with _event_cache_lock:
+        cached = _event_cache.get(event_id)
+    request = service.events().get(calendarId="primary", eventId=event_id, fields=EVENT_READ_FIELDS)
+    if cached is not None:
+        request.headers["If-None-Match"] = cached[0]
+    try:
+        event = request.execute(num_retries=READ_RETRIES)
+    except HttpError as error:
+        if cached is not None and error.resp.status == 304:
+            # Callers mutate the event, so never hand out the cached dict itself
+            return copy.deepcopy(cached[1])
+        raise
+    if 'etag' in event:
+        with _event_cache_lock:
+            _event_cache[event_id] = (event['etag'], copy.deepcopy(event))
+    return event
+
+def _parse_api_time(value):
+    """
+    Parses a timestamp or date returned by the Calendar API.
+    The API always sends RFC 3339, which fromisoformat handles much faster than
+    dateutil once a trailing 'Z' is spelled as an offset.
+    """
+    try:
+        return datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return date_parse(value)
+
+def _parse_input_date(value):
+    """
+    Parses a 'YYYY-MM-DD' date from a tool argument with fromisoformat, falling back
+    to dateutil for the occasional other spelling. Raises ValueError if neither works.
+    """
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        return date_parse(value).date()
+
+def _ceil_minutes(delta):
+    """Rounds a timedelta up to whole minutes."""
+    return -(-int(delta.total_seconds()) // 60)
+
+def _format_clock(minutes):
+    """Formats minutes from local midnight as a 12-hour time like '9:05 AM', wrapping past midnight."""
+    hour, minute = divmod(minutes % 1440, 60)
+    return f"{(hour + 11) % 12 + 1}:{minute:02d} {'PM' if hour >= 12 else 'AM'}"
+
+# Partial-response masks: only request the event fields the tools actually read
+EVENT_LIST_FIELDS = "items(id,summary,htmlLink,start,end),nextPageToken"
+# get_event_details and update_calendar_event share one mask so they share ETag cache entries
+EVENT_READ_FIELDS = "etag,summary,description,htmlLink,start,end,attendees"
+# The subset of a read event that update_calendar_event sends back as a patch
+UPDATE_PATCH_KEYS = ("summary", "description", "start", "end", "attendees")
+CREATED_EVENT_FIELDS = "id,summary,htmlLink"
+UPDATED_EVENT_FIELDS = "summary,htmlLink"
 
 class CalendarEventInput(BaseModel):
     summary: str = Field(description="The summary or title of the event.")
-    description: Optional[str] = Field(description="The detailed description of the event.")
+    description: Optional[str] = Field(None, description="The detailed description of the event.")
     start_time: str = Field(description="The start time in ISO format, e.g., '2024-07-29T10:00:00'.")
     end_time: str = Field(description="The end time in ISO format, e.g., '2024-07-29T11:00:00'.")
-    attendees: Optional[List[str]] = Field(description="A list of attendee emails.")
+    attendees: Optional[List[str]] = Field(None, description="A list of attendee emails.")
+
+def _build_event_body(summary, start_time, end_time, description=None, attendees=None):
+    return {
+        "summary": summary,
+        "description": description,
+        "start": {"dateTime": start_time, "timeZone": LOCAL_TZ_NAME},
+        "end": {"dateTime": end_time, "timeZone": LOCAL_TZ_NAME},
+        "attendees": [{"email": email} for email in attendees] if attendees else [],
+    }
 
 @tool("create_calendar_event", args_schema=CalendarEventInput)
 def create_calendar_event(summary: str, start_time: str, end_time: str, description: Optional[str] = None, attendees: Optional[List[str]] = None) -> str:
     """Creates a Google Calendar event with the specified details."""
     try:
         service = get_calendar_service()
-        local_timezone = get_localzone_name()
-        event = {
-            "summary": summary,
-            "description": description,
-            "start": {"dateTime": start_time, "timeZone": local_timezone},
-            "end": {"dateTime": end_time, "timeZone": local_timezone},
-            "attendees": [{"email": email} for email in attendees] if attendees else [],
-        }
-        event = service.events().insert(calendarId="primary", body=event).execute()
+        event = _build_event_body(summary, start_time, end_time, description, attendees)
+        event = service.events().insert(calendarId="primary", body=event, fields=CREATED_EVENT_FIELDS).execute()
+        _invalidate_event_cache()
         
         event_link = event.get('htmlLink', 'No link available')
         event_id = event.get('id', 'No ID')
@@ -112,6 +324,10 @@ def create_calendar_event(summary: str, start_time: str, end_time: str, descript
 You can click the link above to view or edit the event in Google Calendar."""
     except (HttpError, FileNotFoundError, ValueError) as error:
         return f"An error occurred: {error}"
+    except (httplib2.HttpLib2Error, OSError) as error:
+        # The connection failed mid-request; Google may still have created the event
+        _invalidate_event_cache()
+        return f"Error: The connection to Google Calendar failed ({error}), so it is unknown whether the event was created. Check the calendar before trying again."
 
 class GetCalendarEventsInput(BaseModel):
     start_date: Optional[str] = Field(None, description="The start date for the event search, in 'YYYY-MM-DD' format. If not provided, the search starts from the current time.")
@@ -128,62 +344,55 @@ def get_calendar_events(start_date: Optional[str] = None, end_date: Optional[str
     """
     try:
         service = get_calendar_service()
-        local_tz_name = get_localzone_name()
-        local_tz = gettz(local_tz_name)
+        local_tz = LOCAL_TZ
 
         time_min = None
         time_max = None
 
         if start_date:
             try:
-                start_dt = date_parse(start_date)
+                start_day = _parse_input_date(start_date)
                 # Localize the start time to the beginning of the day
-                time_min = datetime.datetime.combine(start_dt.date(), datetime.time.min).astimezone(local_tz).isoformat()
+                time_min = datetime.datetime.combine(start_day, datetime.time.min, tzinfo=local_tz).isoformat()
             except ValueError:
                 return "Error: Invalid start_date format. Please use YYYY-MM-DD."
         else:
-            # If no start date, search from now
-            time_min = datetime.datetime.utcnow().isoformat() + "Z"
+            # If no start date, search from the current minute, so repeated searches share a cache key
+            time_min = datetime.datetime.now(_UTC).replace(second=0, microsecond=0).isoformat()
 
         if end_date:
             try:
-                end_dt = date_parse(end_date)
+                end_day = _parse_input_date(end_date)
                 # Localize the end time to the end of the day
-                time_max = datetime.datetime.combine(end_dt.date(), datetime.time.max).astimezone(local_tz).isoformat()
+                time_max = datetime.datetime.combine(end_day, datetime.time.max, tzinfo=local_tz).isoformat()
             except ValueError:
                 return "Error: Invalid end_date format. Please use YYYY-MM-DD."
         elif start_date:
             # If start_date is given but not end_date, search for the whole day.
-            start_dt = date_parse(start_date)
-            time_max = datetime.datetime.combine(start_dt.date(), datetime.time.max).astimezone(local_tz).isoformat()
+            time_max = datetime.datetime.combine(start_day, datetime.time.max, tzinfo=local_tz).isoformat()
 
         list_kwargs = {
             "calendarId": "primary",
             "timeMin": time_min,
-            "maxResults": max_results,
             "singleEvents": True,
             "orderBy": "startTime",
+            "fields": EVENT_LIST_FIELDS,
         }
         if time_max:
             list_kwargs["timeMax"] = time_max
         if query:
             list_kwargs["q"] = query
 
-        events_result = service.events().list(**list_kwargs).execute()
-        events = events_result.get("items", [])
-
-        if not events:
-            return "No events found matching your criteria."
-
-        result = "📅 **Found the following events:**\n\n"
-        for i, event in enumerate(events, 1):
+        # Events are formatted as their pages arrive
+        parts = ["📅 **Found the following events:**\n\n"]
+        for i, event in enumerate(_iter_events(service, list_kwargs, max_results), 1):
             start = event["start"].get("dateTime", event["start"].get("date"))
-            start_dt = date_parse(start)
+            start_dt = _parse_api_time(start)
 
             if 'dateTime' in event['start']:
                 time_info = start_dt.astimezone(local_tz).strftime("%I:%M %p").lstrip('0')
                 end_str = event["end"].get("dateTime", event["end"].get("date"))
-                end_dt = date_parse(end_str)
+                end_dt = _parse_api_time(end_str)
                 end_time_info = end_dt.astimezone(local_tz).strftime("%I:%M %p").lstrip('0')
                 duration = end_dt - start_dt
                 duration_str = f"({duration})"
@@ -196,12 +405,16 @@ def get_calendar_events(start_date: Optional[str] = None, end_date: Optional[str
             event_id = event.get("id", "No ID")
             event_link = event.get('htmlLink', 'No link available')
             
-            result += f"{i}. **{event_summary}**\n"
-            result += f"   - Time: {time_info} to {end_time_info} {duration_str}\n"
-            result += f"   - ID: `{event_id}`\n"
-            result += f"   - Link: [View Event]({event_link})\n\n"
-        
-        return result
+            parts.append(
+                f"{i}. **{event_summary}**\n"
+                f"   - Time: {time_info} to {end_time_info} {duration_str}\n"
+                f"   - ID: `{event_id}`\n"
+                f"   - Link: [View Event]({event_link})\n\n"
+            )
+
+        if len(parts) == 1:
+            return "No events found matching your criteria."
+        return "".join(parts)
     except (HttpError, FileNotFoundError, ValueError) as error:
         return f"An error occurred: {error}"
 
@@ -215,8 +428,8 @@ def get_event_details(event_id: str) -> str:
     """
     try:
         service = get_calendar_service()
-        event = service.events().get(calendarId="primary", eventId=event_id).execute()
-        local_tz = gettz(get_localzone_name())
+        event = _get_event(service, event_id)
+        local_tz = LOCAL_TZ
 
         # Extract details
         summary = event.get("summary", "No Title")
@@ -224,8 +437,8 @@ def get_event_details(event_id: str) -> str:
         start_str = event["start"].get("dateTime", event["start"].get("date"))
         end_str = event["end"].get("dateTime", event["end"].get("date"))
         
-        start_dt = date_parse(start_str).astimezone(local_tz)
-        end_dt = date_parse(end_str).astimezone(local_tz)
+        start_dt = _parse_api_time(start_str).astimezone(local_tz)
+        end_dt = _parse_api_time(end_str).astimezone(local_tz)
 
         if 'dateTime' in event['start']:
             time_str = f"{start_dt.strftime('%A, %B %d, %Y from %I:%M %p')} to {end_dt.strftime('%I:%M %p %Z')}"
@@ -266,6 +479,41 @@ class UpdateEventInput(BaseModel):
     attendees_to_add: Optional[List[str]] = Field(None, description="A list of attendee emails to add.")
     attendees_to_remove: Optional[List[str]] = Field(None, description="A list of attendee emails to remove.")
 
+def _build_patch_body(update_data):
+    """
+    Builds a partial event body holding only the changed summary, description and times.
+
+    PATCH merges nested objects, so times are sent without a timeZone and the event keeps
+    its own zone (the offset in dateTime fixes the instant), and "date" is cleared so an
+    all-day event can become a timed one.
+    """
+    body = {}
+    if 'summary' in update_data:
+        body['summary'] = update_data['summary']
+    if 'description' in update_data:
+        body['description'] = update_data['description']
+    if 'start_time' in update_data:
+        start_dt = date_parse(update_data['start_time']).astimezone(LOCAL_TZ)
+        body['start'] = {'dateTime': start_dt.isoformat(), 'date': None}
+    if 'end_time' in update_data:
+        end_dt = date_parse(update_data['end_time']).astimezone(LOCAL_TZ)
+        body['end'] = {'dateTime': end_dt.isoformat(), 'date': None}
+    return body
+
+def _format_updated_event(updated_event, event_id):
+    event_link = updated_event.get('htmlLink', 'No link available')
+    event_title = updated_event.get('summary', 'Unknown')
+    
+    return f"""✅ Event updated successfully!
+
+📅 **Updated Event:**
+- **Title:** {event_title}
+- **Event ID:** {event_id}
+
+🔗 **View Updated Event:** {event_link}
+
+You can click the link above to view the updated event in Google Calendar."""
+
 @tool("update_calendar_event", args_schema=UpdateEventInput)
 def update_calendar_event(event_id: str, **kwargs) -> str:
     """
@@ -276,14 +524,36 @@ def update_calendar_event(event_id: str, **kwargs) -> str:
     - It automatically handles timezone conversions.
     """
     try:
+        update_data = {k: v for k, v in kwargs.items() if v is not None}
+        if not update_data:
+            return "Error: No changes were provided for the event."
         service = get_calendar_service()
-        event = service.events().get(calendarId="primary", eventId=event_id).execute()
+
+        # Attendee diffs and duration preservation need the existing event;
+        # everything else can be sent as a single partial patch.
+        needs_existing = (
+            'attendees_to_add' in update_data
+            or 'attendees_to_remove' in update_data
+            or ('start_time' in update_data and 'end_time' not in update_data)
+        )
+        if not needs_existing:
+            updated_event = service.events().patch(
+                calendarId="primary",
+                eventId=event_id,
+                body=_build_patch_body(update_data),
+                fields=UPDATED_EVENT_FIELDS,
+                sendUpdates='all' # Notify attendees of the changes
+            ).execute()
+            _invalidate_event_cache()
+            return _format_updated_event(updated_event, event_id)
+
+        # Only the fields the update reads are fetched; they are sent back as a patch
+        event = _get_event(service, event_id)
         
         # Use the timezone from the original event or fallback to local timezone
-        event_timezone = event.get('start', {}).get('timeZone', get_localzone_name())
-        tz = gettz(event_timezone)
-
-        update_data = {k: v for k, v in kwargs.items() if v is not None}
+        event_timezone = event.get('start', {}).get('timeZone', LOCAL_TZ_NAME)
+        # Reuse the cached local tzinfo for the common case; an unknown zone name falls back to it too
+        tz = LOCAL_TZ if event_timezone == LOCAL_TZ_NAME else (gettz(event_timezone) or LOCAL_TZ)
         
         # Smart duration handling
         if 'start_time' in update_data and 'end_time' not in update_data:
@@ -291,8 +561,8 @@ def update_calendar_event(event_id: str, **kwargs) -> str:
             end_dt_str = event['end'].get('dateTime')
             
             if start_dt_str and end_dt_str:
-                original_start = date_parse(start_dt_str)
-                original_end = date_parse(end_dt_str)
+                original_start = _parse_api_time(start_dt_str)
+                original_end = _parse_api_time(end_dt_str)
                 duration = original_end - original_start
                 
                 new_start = date_parse(update_data['start_time']).astimezone(tz)
@@ -309,46 +579,47 @@ def update_calendar_event(event_id: str, **kwargs) -> str:
         
         if 'start_time' in update_data:
             start_dt = date_parse(update_data['start_time']).astimezone(tz)
-            event['start'] = {'dateTime': start_dt.isoformat(), 'timeZone': event_timezone}
+            # The patch merges into the stored start, so clear an all-day "date"
+            event['start'] = {'dateTime': start_dt.isoformat(), 'date': None, 'timeZone': event_timezone}
         
         if 'end_time' in update_data:
             end_dt = date_parse(update_data['end_time']).astimezone(tz)
-            event['end'] = {'dateTime': end_dt.isoformat(), 'timeZone': event_timezone}
-
-        if 'attendees_to_add' in update_data:
-            if 'attendees' not in event:
-                event['attendees'] = []
-            existing_emails = {a['email'] for a in event.get('attendees', [])}
-            for email in update_data['attendees_to_add']:
-                if email not in existing_emails:
-                    event['attendees'].append({'email': email})
-
-        if 'attendees_to_remove' in update_data:
-            if 'attendees' in event:
-                emails_to_remove = set(update_data['attendees_to_remove'])
-                event['attendees'] = [a for a in event['attendees'] if a.get('email') not in emails_to_remove]
-
-        updated_event = service.events().update(
+            event['end'] = {'dateTime': end_dt.isoformat(), 'date': None, 'timeZone': event_timezone}
+
+        if 'attendees_to_add' in update_data or 'attendees_to_remove' in update_data:
+            # Keyed by email so existing attendees keep their responseStatus and other metadata.
+            # Emails are matched case-insensitively, as Google Calendar does.
+            attendees = {a.get('email', '').lower(): a for a in event.get('attendees', [])}
+            for email in update_data.get('attendees_to_add', ()):
+                attendees.setdefault(email.lower(), {'email': email})
+            for email in update_data.get('attendees_to_remove', ()):
+                attendees.pop(email.lower(), None)
+            event['attendees'] = list(attendees.values())
+
+        patch_request = service.events().patch(
             calendarId="primary", 
             eventId=event_id, 
-            body=event,
+            body={key: event[key] for key in UPDATE_PATCH_KEYS if key in event},
+            fields=UPDATED_EVENT_FIELDS,
             sendUpdates='all' # Notify attendees of the changes
-        ).execute()
-        
-        event_link = updated_event.get('htmlLink', 'No link available')
-        event_title = updated_event.get('summary', 'Unknown')
+        )
+        if 'etag' in event:
+            # Refuse the write if someone changed the event since we read it
+            patch_request.headers["If-Match"] = event['etag']
+        updated_event = patch_request.execute()
+        _invalidate_event_cache()
         
-        return f"""✅ Event updated successfully!
-
-📅 **Updated Event:**
-- **Title:** {event_title}
-- **Event ID:** {event_id}
-
-🔗 **View Updated Event:** {event_link}
-
-You can click the link above to view the updated event in Google Calendar."""
-    except (HttpError, FileNotFoundError, ValueError) as error:
+        return _format_updated_event(updated_event, event_id)
+    except HttpError as error:
+        if error.resp.status == 412:
+            return "Error: The event was changed by someone else while it was being updated. Please try again."
         return f"An error occurred: {error}"
+    except (FileNotFoundError, ValueError) as error:
+        return f"An error occurred: {error}"
+    except (httplib2.HttpLib2Error, OSError) as error:
+        # The connection failed mid-request; Google may still have applied the update
+        _invalidate_event_cache()
+        return f"Error: The connection to Google Calendar failed ({error}), so it is unknown whether the event was updated. Check the event before trying again."
 
 class FindAvailabilityInput(BaseModel):
     start_date: str = Field(description="Start date in ISO format 'YYYY-MM-DD'")
@@ -356,11 +627,13 @@ class FindAvailabilityInput(BaseModel):
     start_hour: int = Field(9, description="Start of working hours (24-hour format, default 9 for 9 AM)")
     end_hour: int = Field(17, description="End of working hours (24-hour format, default 17 for 5 PM)")
     duration_minutes: int = Field(30, description="Duration of the meeting in minutes")
+    calendar_ids: Optional[List[str]] = Field(None, description="Other people's calendar IDs (usually their emails) that must also be free. The user's own calendar is always checked.")
 
 @tool("find_available_time_slots", args_schema=FindAvailabilityInput)
-def find_available_time_slots(start_date: str, end_date: Optional[str] = None, start_hour: int = 9, end_hour: int = 17, duration_minutes: int = 30) -> str:
+def find_available_time_slots(start_date: str, end_date: Optional[str] = None, start_hour: int = 9, end_hour: int = 17, duration_minutes: int = 30, calendar_ids: Optional[List[str]] = None) -> str:
     """
     Finds available time slots in the user's calendar within a given date range and working hours.
+    When calendar_ids are given, only slots where all of those calendars are free too are returned.
     
     Args:
         start_date: Date in ISO format 'YYYY-MM-DD'
@@ -368,17 +641,17 @@ def find_available_time_slots(start_date: str, end_date: Optional[str] = None, s
         start_hour: Start of working hours (24-hour format, default 9 for 9 AM)
         end_hour: End of working hours (24-hour format, default 17 for 5 PM)
         duration_minutes: Duration of the meeting in minutes (default 30)
+        calendar_ids: Optional. Other calendars (e.g. co-workers' emails) to check alongside the user's
     """
     try:
         service = get_calendar_service()
-        local_tz_name = get_localzone_name()
-        local_tz = gettz(local_tz_name)
-        now_utc = datetime.datetime.now(datetime.timezone.utc)
+        local_tz = LOCAL_TZ
+        now_utc = datetime.datetime.now(_UTC)
 
         # Parse dates
         try:
-            parsed_start_date = date_parse(start_date).date()
-            parsed_end_date = date_parse(end_date).date() if end_date else parsed_start_date
+            parsed_start_date = _parse_input_date(start_date)
+            parsed_end_date = _parse_input_date(end_date) if end_date else parsed_start_date
         except ValueError:
             return "Error: Dates must be in YYYY-MM-DD format."
 
@@ -398,23 +671,48 @@ def find_available_time_slots(start_date: str, end_date: Optional[str] = None, s
             return "Error: Duration must be between 1 and 1440 minutes."
 
         # Perform core logic in UTC
-        time_min_utc = datetime.datetime.combine(parsed_start_date, datetime.time.min, tzinfo=local_tz).astimezone(datetime.timezone.utc)
-        time_max_utc = datetime.datetime.combine(parsed_end_date, datetime.time.max, tzinfo=local_tz).astimezone(datetime.timezone.utc)
+        time_min_utc = datetime.datetime.combine(parsed_start_date, datetime.time.min, tzinfo=local_tz).astimezone(_UTC)
+        time_max_utc = datetime.datetime.combine(parsed_end_date, datetime.time.max, tzinfo=local_tz).astimezone(_UTC)
 
+        # All calendars are checked in a single query; duplicates would only repeat busy blocks
+        checked_ids = list(dict.fromkeys(["primary", *(calendar_ids or [])]))
         freebusy_request = {
             "timeMin": time_min_utc.isoformat(),
             "timeMax": time_max_utc.isoformat(),
-            "timeZone": local_tz_name, # Use local TZ for Google to interpret days correctly
-            "items": [{"id": "primary"}],
+            "timeZone": LOCAL_TZ_NAME, # Use local TZ for Google to interpret days correctly
+            "items": [{"id": calendar_id} for calendar_id in checked_ids],
         }
 
-        freebusy_result = service.freebusy().query(body=freebusy_request).execute()
-        busy_slots = freebusy_result.get("calendars", {}).get("primary", {}).get("busy", [])
-        
-        # All busy times are parsed as timezone-aware UTC objects
-        busy_times_utc = sorted([(date_parse(slot['start']), date_parse(slot['end'])) for slot in busy_slots])
+        freebusy_result = service.freebusy().query(body=freebusy_request).execute(num_retries=READ_RETRIES)
+        calendars = freebusy_result.get("calendars", {})
+
+        # A calendar we can't read would look completely free, so report it instead
+        unavailable = [
+            calendar_id for calendar_id in checked_ids
+            if calendar_id not in calendars or calendars[calendar_id].get("errors")
+        ]
+        if unavailable:
+            return f"Error: Could not read the availability of: {', '.join(unavailable)}."
+
+        # Busy times from every calendar are parsed as timezone-aware UTC objects and merged together
+        busy_times_utc = sorted(
+            (_parse_api_time(slot['start']), _parse_api_time(slot['end']))
+            for calendar_id in checked_ids
+            for slot in calendars.get(calendar_id, {}).get("busy", [])
+        )
+
+        # Merge overlapping busy blocks once. The result is disjoint, so starts and ends
+        # are both sorted and each day's blocks can be located by bisection.
+        merged_busy_utc = []
+        for busy_start, busy_end in busy_times_utc:
+            if merged_busy_utc and busy_start <= merged_busy_utc[-1][1]:
+                merged_busy_utc[-1] = (merged_busy_utc[-1][0], max(merged_busy_utc[-1][1], busy_end))
+            else:
+                merged_busy_utc.append((busy_start, busy_end))
+        busy_starts = [s for s, _ in merged_busy_utc]
+        busy_ends = [e for _, e in merged_busy_utc]
 
-        available_slots_str = ""
+        day_sections = []
         current_date = parsed_start_date
         duration = datetime.timedelta(minutes=duration_minutes)
 
@@ -424,8 +722,8 @@ def find_available_time_slots(start_date: str, end_date: Optional[str] = None, s
             # Define work day in local time, then convert to UTC
             work_start_local = datetime.datetime.combine(current_date, datetime.time(start_hour, 0), tzinfo=local_tz)
             work_end_local = datetime.datetime.combine(current_date, datetime.time(end_hour, 0), tzinfo=local_tz)
-            work_start_utc = work_start_local.astimezone(datetime.timezone.utc)
-            work_end_utc = work_end_local.astimezone(datetime.timezone.utc)
+            work_start_utc = work_start_local.astimezone(_UTC)
+            work_end_utc = work_end_local.astimezone(_UTC)
 
             # Determine search start time in UTC
             search_start_utc = max(now_utc, work_start_utc)
@@ -434,59 +732,59 @@ def find_available_time_slots(start_date: str, end_date: Optional[str] = None, s
                 current_date += datetime.timedelta(days=1)
                 continue
 
-            current_time_utc = search_start_utc
-
-            # Filter busy times for the current day's working hours
-            day_busy_times_utc = [
-                (s, e) for s, e in busy_times_utc 
-                if s < work_end_utc and e > work_start_utc
-            ]
-
-            merged_busy_times = []
-            for busy_start, busy_end in sorted(day_busy_times_utc):
-                if not merged_busy_times or busy_start > merged_busy_times[-1][1]:
-                    merged_busy_times.append([busy_start, busy_end])
+            # Work in whole minutes from the start of the working day; only kept slots become datetimes.
+            # The day length comes from the UTC bounds so DST transition days stay correct.
+            day_minutes = int((work_end_utc - work_start_utc).total_seconds()) // 60
+            cursor = _ceil_minutes(search_start_utc - work_start_utc)
+
+            # Busy blocks overlapping the working hours: ending after they start and starting before they end
+            day_busy_times_utc = merged_busy_utc[bisect_right(busy_ends, work_start_utc):bisect_left(busy_starts, work_end_utc)]
+
+            # Clip to the working day in whole minutes; rounding can make neighbours touch, so merge again
+            merged_busy = []
+            for busy_start, busy_end in day_busy_times_utc:
+                lo = max(0, int((busy_start - work_start_utc).total_seconds()) // 60)
+                hi = min(day_minutes, _ceil_minutes(busy_end - work_start_utc))
+                if merged_busy and lo <= merged_busy[-1][1]:
+                    merged_busy[-1][1] = max(merged_busy[-1][1], hi)
                 else:
-                    merged_busy_times[-1][1] = max(merged_busy_times[-1][1], busy_end)
-            
-            for busy_start, busy_end in merged_busy_times:
-                free_end_utc = min(busy_start, work_end_utc)
-                if current_time_utc < free_end_utc:
-                    slot_start_utc = current_time_utc
-                    while slot_start_utc + duration <= free_end_utc:
-                        slot_end_utc = slot_start_utc + duration
-                        # Convert back to local time for display
-                        slot_start_local = slot_start_utc.astimezone(local_tz)
-                        slot_end_local = slot_end_utc.astimezone(local_tz)
+                    merged_busy.append([lo, hi])
+            # Sentinel block at the end of the day closes the final free gap
+            merged_busy.append([day_minutes, day_minutes])
+
+            # Without a DST change inside the working hours, local clock time is just
+            # the offset from the start hour, so slots are formatted without datetimes
+            # (normalized through UTC, in case the start hour falls in a skipped DST hour)
+            day_start_local = work_start_utc.astimezone(local_tz)
+            fixed_offset = day_start_local.utcoffset() == work_end_utc.astimezone(local_tz).utcoffset()
+            work_start_minutes = day_start_local.hour * 60 + day_start_local.minute
+
+            for busy_lo, busy_hi in merged_busy:
+                for offset in range(cursor, busy_lo - duration_minutes + 1, duration_minutes):
+                    if fixed_offset:
+                        slot_start_minutes = work_start_minutes + offset
                         day_slots.append(
-                            f"{slot_start_local.strftime('%I:%M %p').lstrip('0')} to "
-                            f"{slot_end_local.strftime('%I:%M %p').lstrip('0')}"
+                            f"{_format_clock(slot_start_minutes)} to "
+                            f"{_format_clock(slot_start_minutes + duration_minutes)}"
                         )
-                        slot_start_utc += duration
-                current_time_utc = max(current_time_utc, busy_end)
-
-            if current_time_utc < work_end_utc:
-                slot_start_utc = current_time_utc
-                while slot_start_utc + duration <= work_end_utc:
-                    slot_end_utc = slot_start_utc + duration
+                        continue
+                    slot_start_utc = work_start_utc + datetime.timedelta(minutes=offset)
+                    # Convert back to local time for display
                     slot_start_local = slot_start_utc.astimezone(local_tz)
-                    slot_end_local = slot_end_utc.astimezone(local_tz)
+                    slot_end_local = (slot_start_utc + duration).astimezone(local_tz)
                     day_slots.append(
-                        f"{slot_start_local.strftime('%I:%M %p').lstrip('0')} to "
-                        f"{slot_end_local.strftime('%I:%M %p').lstrip('0')}"
+                        f"{_format_clock(slot_start_local.hour * 60 + slot_start_local.minute)} to "
+                        f"{_format_clock(slot_end_local.hour * 60 + slot_end_local.minute)}"
                     )
-                    slot_start_utc += duration
+                cursor = max(cursor, busy_hi)
 
             if day_slots:
-                try:
-                    date_str = current_date.strftime('%A, %B %d')
-                    available_slots_str += f"\n🗓️ **{date_str}**:\n" + "\n".join(f"- {s}" for s in day_slots)
-                except ValueError:
-                    continue
+                date_str = current_date.strftime('%A, %B %d')
+                day_sections.append(f"\n🗓️ **{date_str}**:\n" + "\n".join(f"- {s}" for s in day_slots))
             
             current_date += datetime.timedelta(days=1)
 
-        if not available_slots_str:
+        if not day_sections:
             try:
                 date_range = (
                     f"{parsed_start_date.strftime('%Y-%m-%d')} to {parsed_end_date.strftime('%Y-%m-%d')}"
@@ -500,9 +798,115 @@ def find_available_time_slots(start_date: str, end_date: Optional[str] = None, s
             except ValueError:
                 return "No available slots found for the specified time range."
 
-        return "✅ Here are the available time slots:\n" + available_slots_str
+        return "✅ Here are the available time slots:\n" + "".join(day_sections)
 
     except (HttpError, FileNotFoundError) as error:
         return f"An error occurred: {error}"
     except Exception as e:
         return f"An unexpected error occurred: {str(e)}"
+
+# Google Calendar accepts at most 50 sub-requests per batch call.
+MAX_BATCH_SIZE = 50
+
+class EventChanges(BaseModel):
+    event_id: str = Field(description="The unique ID of the event to update.")
+    summary: Optional[str] = Field(None, description="The new summary or title for the event.")
+    description: Optional[str] = Field(None, description="The new description for the event.")
+    start_time: Optional[str] = Field(None, description="The new start time in ISO format. Must be given together with end_time.")
+    end_time: Optional[str] = Field(None, description="The new end time in ISO format. Must be given together with start_time.")
+
+class BatchCalendarOpsInput(BaseModel):
+    creates: List[CalendarEventInput] = Field(default_factory=list, description="New events to create.")
+    updates: List[EventChanges] = Field(default_factory=list, description="Changes to existing events, one entry per event.")
+
+@tool("batch_calendar_ops", args_schema=BatchCalendarOpsInput)
+def batch_calendar_ops(creates: Optional[List[CalendarEventInput]] = None, updates: Optional[List[EventChanges]] = None) -> str:
+    """
+    Creates and/or updates several calendar events in a single request.
+    Use this instead of calling create_calendar_event or update_calendar_event repeatedly
+    when one user request touches more than one event.
+    Updates can change the title, description or times; to change attendees, use update_calendar_event.
+    """
+    if not creates and not updates:
+        return "Error: No events to create or update were provided."
+    try:
+        service = get_calendar_service()
+
+        lines = []
+        # (action, target, request) for each call sent through the batch endpoint
+        operations = []
+        for new_event in creates or []:
+            if isinstance(new_event, dict):
+                new_event = CalendarEventInput(**new_event)
+            body = _build_event_body(new_event.summary, new_event.start_time, new_event.end_time, new_event.description, new_event.attendees)
+            operations.append((
+                "create", f"**{new_event.summary}**",
+                service.events().insert(calendarId="primary", body=body, fields=CREATED_EVENT_FIELDS),
+            ))
+
+        for change in updates or []:
+            if isinstance(change, dict):
+                change = EventChanges(**change)
+            if (change.start_time is None) != (change.end_time is None):
+                lines.append(f"- `{change.event_id}`: skipped, start_time and end_time must be changed together.")
+                continue
+
+            body = _build_patch_body({k: v for k, v in change.model_dump().items() if v is not None})
+            if not body:
+                lines.append(f"- `{change.event_id}`: skipped, nothing to change.")
+                continue
+            operations.append((
+                "update", f"`{change.event_id}`",
+                service.events().patch(calendarId="primary", eventId=change.event_id, body=body, fields=UPDATED_EVENT_FIELDS, sendUpdates='all'),
+            ))
+
+        # Collect the batch results keyed by request id
+        results = {}
+        def collect(request_id, response, exception):
+            results[request_id] = (response, exception)
+
+        # Earlier chunks are already applied when a later one fails, so stop there
+        # and still report and invalidate for everything that was sent
+        batch_error = None
+        executed = 0
+        try:
+            for offset in range(0, len(operations), MAX_BATCH_SIZE):
+                batch = service.new_batch_http_request(callback=collect)
+                for index in range(offset, min(offset + MAX_BATCH_SIZE, len(operations))):
+                    batch.add(operations[index][2], request_id=str(index))
+                executed = min(offset + MAX_BATCH_SIZE, len(operations))
+                batch.execute()
+        except (HttpError, httplib2.HttpLib2Error, OSError) as error:
+            batch_error = error
+        finally:
+            if executed:
+                _invalidate_event_cache()
+
+        succeeded = 0
+        for index, (action, target, _) in enumerate(operations):
+            response, exception = results.get(str(index), (None, None))
+            if index >= executed:
+                lines.append(f"- Did not {action} {target}: an earlier batch failed.")
+            elif batch_error is not None and response is None and exception is None:
+                lines.append(f"- Unknown whether {target} was {action}d, its batch failed.")
+            elif exception is not None or response is None:
+                lines.append(f"- Failed to {action} {target}: {exception}")
+            else:
+                succeeded += 1
+                event_link = response.get('htmlLink', 'No link available')
+                title = response.get('summary', 'Unknown')
+                event_id = f" (`{response['id']}`)" if 'id' in response else f" ({target})"
+                lines.append(f"- {action.capitalize()}d **{title}**{event_id}: [View Event]({event_link})")
+
+        total = len(creates or []) + len(updates or [])
+        if batch_error is not None:
+            return f"⚠️ Completed {succeeded} of {total} operations before a batch failed ({batch_error}):\n" + "\n".join(lines)
+        return f"✅ Completed {succeeded} of {total} operations:\n" + "\n".join(lines)
+    except (HttpError, FileNotFoundError, ValueError) as error:
+        return f"An error occurred: {error}"
+
+# Every tool exposed to the agent, in the order they are bound to the model
+CALENDAR_TOOLS = [create_calendar_event, get_calendar_events, update_calendar_event, find_available_time_slots, get_event_details, batch_calendar_ops]
+
+# Names of the tools that never modify the calendar
+READ_ONLY_TOOL_NAMES = frozenset(t.name for t in (get_calendar_events, get_event_details, find_available_time_slots))
@@ -1,43 +1,152 @@
 import streamlit as st
 import requests
-import json
+from requests.adapters import HTTPAdapter
 import os
+import json
+import time
+import uuid
 
 st.title("📅 Calendar Scheduling Assistant")
 
 # Initialize session state
 if "messages" not in st.session_state:
     st.session_state.messages = []
+if "archived_messages" not in st.session_state:
+    st.session_state.archived_messages = []
+if "session_id" not in st.session_state:
+    st.session_state.session_id = str(uuid.uuid4())
 
 # Get backend URL from environment variable or use localhost as fallback
 BACKEND_URL = os.getenv("BACKEND_URL", "http://127.0.0.1:8000")
 
+# Only the most recent messages are rendered on every rerun; older ones are archived
+MAX_RENDERED_MESSAGES = 50
+
+# Example buttons shown while the chat is empty: column heading -> (button label, prompt sent)
+EXAMPLE_PROMPTS = {
+    "**📅 Create Events:**": [
+        ("Schedule team meeting tomorrow at 2 PM", "Schedule a team meeting for tomorrow at 2 PM with my email"),
+        ("Create project review meeting", "Create a project review meeting for Friday at 3 PM for 1 hour"),
+    ],
+    "**🔍 Find & Update:**": [
+        ("Find my meetings today", "Find my meetings for today"),
+        ("Move my next meeting to 4 PM", "Move my next meeting to 4 PM"),
+    ],
+}
+
+EXAMPLES_MARKDOWN = """
+- "Schedule a client call for Monday at 10 AM with karthik@gmail.com"
+- "Find my meeting about the project launch"
+- "Change tomorrow's standup to 11 AM instead"
+- "Add jasmine@gmail.com to the project review meeting"
+"""
+
+# How long a read-only reply is reused when the user immediately sends the same prompt again
+REPEAT_REPLY_TTL = 60
+
+# (connect, read) timeouts in seconds; agent replies can take a while
+REQUEST_TIMEOUT = (3.05, 60)
+
+@st.cache_resource
+def get_http_session():
+    """Returns a pooled HTTP session shared across reruns, so backend connections are kept alive."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=4)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def stream_reply(message, result):
+    """
+    Yields the assistant's reply chunk by chunk from the backend's Server-Sent Events stream.
+    The fields of the final "done" event are stored in result.
+    """
+    payload = {"query": message, "session_id": st.session_state.session_id}
+    with get_http_session().post(f"{BACKEND_URL}/chat/stream", json=payload, stream=True, timeout=REQUEST_TIMEOUT) as response:
+        response.raise_for_status()
+        response.encoding = "utf-8"
+
+        event, data = "message", []
+        for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+            if line == "":
+                # A blank line ends one event
+                if event == "done":
+                    if data:
+                        result.update(json.loads("\n".join(data)))
+                    return
+                if data:
+                    yield "\n".join(data)
+                event, data = "message", []
+            elif line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                value = line[len("data:"):]
+                data.append(value[1:] if value.startswith(" ") else value)
+            # Lines starting with ":" are keep-alive comments
+
+def archive_old_messages():
+    """Moves messages beyond the render cap into the archive, oldest first"""
+    overflow = len(st.session_state.messages) - MAX_RENDERED_MESSAGES
+    if overflow > 0:
+        st.session_state.archived_messages.extend(st.session_state.messages[:overflow])
+        del st.session_state.messages[:overflow]
+
+def repeated_reply(message):
+    """
+    Returns the previous reply if message repeats the previous prompt exactly, that reply
+    did not modify the calendar and it is recent; otherwise None.
+    """
+    messages = st.session_state.messages
+    if len(messages) < 2:
+        return None
+    previous_prompt, previous_reply = messages[-2], messages[-1]
+    if (
+        previous_prompt["role"] == "user"
+        and previous_prompt["content"] == message
+        and previous_reply.get("read_only")
+        and time.time() - previous_reply["time"] < REPEAT_REPLY_TTL
+    ):
+        return previous_reply
+    return None
+
 def send_message(message):
-    """Helper function to send a message and get response from backend"""
+    """Helper function to send a message and stream the response from backend"""
+    reused = repeated_reply(message)
+
     # Add user message to chat history
     st.session_state.messages.append({"role": "user", "content": message})
+
+    # An immediate exact repeat (e.g. a double-clicked example) is answered without the backend;
+    # the copy keeps the original time, so a reply is never reused beyond the TTL
+    if reused is not None:
+        st.session_state.messages.append(dict(reused))
+        archive_old_messages()
+        return
     
-    # Call the backend API
+    # Call the backend API and render the reply as it arrives
     try:
-        payload = {"query": message}
-        
-        response = requests.post(f"{BACKEND_URL}/chat", json=payload)
-        response.raise_for_status()
-        
-        backend_response = response.json()
-        ai_response = backend_response.get("response", "Sorry, I encountered an error.")
+        result = {}
+        with st.chat_message("assistant"):
+            ai_response = st.write_stream(stream_reply(message, result))
+        if not ai_response:
+            ai_response = "Sorry, I encountered an error."
+            # Never reuse an error reply
+            result.pop("read_only", None)
         
         # Add assistant response to chat history
-        st.session_state.messages.append({"role": "assistant", "content": ai_response})
+        st.session_state.messages.append({
+            "role": "assistant",
+            "content": ai_response,
+            "read_only": result.get("read_only", False),
+            "time": time.time(),
+        })
         
     except requests.exceptions.RequestException as e:
         error_message = f"Could not connect to the backend. Please make sure the backend server is running. Error: {e}"
         st.error(error_message)
         st.session_state.messages.append({"role": "assistant", "content": error_message})
-    except json.JSONDecodeError:
-        error_message = "Failed to decode the response from the backend."
-        st.error(error_message)
-        st.session_state.messages.append({"role": "assistant", "content": error_message})
+
+    archive_old_messages()
 
 # Add a clear chat button in the main interface
 col1, col2 = st.columns([4, 1])
@@ -45,21 +154,34 @@ with col2:
     if st.button("🗑️ Clear Chat", help="Clear the conversation history"):
         # Clear backend memory
         try:
-            requests.post(f"{BACKEND_URL}/clear-history")
+            get_http_session().post(f"{BACKEND_URL}/clear-history", json={"session_id": st.session_state.session_id}, timeout=REQUEST_TIMEOUT)
         except requests.exceptions.RequestException as e:
             st.error(f"Failed to clear chat history on the server: {e}")
         
         # Clear frontend state
         st.session_state.messages = []
+        st.session_state.archived_messages = []
         st.rerun()
 
+# Older messages are only rendered on request, so long chats don't slow every rerun
+if st.session_state.archived_messages:
+    if st.toggle(f"Show {len(st.session_state.archived_messages)} older messages"):
+        for message in st.session_state.archived_messages:
+            with st.chat_message(message["role"]):
+                st.markdown(message["content"])
+
 # Display chat messages from history on app rerun
 for message in st.session_state.messages:
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
 
-# React to user input
-if prompt := st.chat_input("How can I help you with your calendar?"):
+def queue_example(prompt):
+    """Button callback; it runs before the next rerun, which then handles the prompt like typed input"""
+    st.session_state.example_prompt = prompt
+
+# React to user input, or to the prompt queued by a clicked example button
+prompt = st.chat_input("How can I help you with your calendar?") or st.session_state.pop("example_prompt", None)
+if prompt:
     # Display user message in chat message container
     st.chat_message("user").markdown(prompt)
     
@@ -73,33 +195,12 @@ if len(st.session_state.messages) == 0:
     st.markdown("### 💡 Try these examples:")
     
     # Create example buttons that users can click
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        st.markdown("**📅 Create Events:**")
-        if st.button("Schedule team meeting tomorrow at 2 PM"):
-            send_message("Schedule a team meeting for tomorrow at 2 PM with my email")
-            st.rerun()
-        
-        if st.button("Create project review meeting"):
-            send_message("Create a project review meeting for Friday at 3 PM for 1 hour")
-            st.rerun()
-    
-    with col2:
-        st.markdown("**🔍 Find & Update:**")
-        if st.button("Find my meetings today"):
-            send_message("Find my meetings for today")
-            st.rerun()
-        
-        if st.button("Move my next meeting to 4 PM"):
-            send_message("Move my next meeting to 4 PM")
-            st.rerun()
+    for column, (heading, examples) in zip(st.columns(len(EXAMPLE_PROMPTS)), EXAMPLE_PROMPTS.items()):
+        with column:
+            st.markdown(heading)
+            for label, example_prompt in examples:
+                st.button(label, on_click=queue_example, args=(example_prompt,))
     
     st.markdown("---")
     st.markdown("**💬 Examples:**")
-    st.markdown("""
-    - "Schedule a client call for Monday at 10 AM with karthik@gmail.com"
-    - "Find my meeting about the project launch"
-    - "Change tomorrow's standup to 11 AM instead"
-    - "Add jasmine@gmail.com to the project review meeting"
-    """)
+    st.markdown(EXAMPLES_MARKDOWN)